@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Removes blacklisted entities from a corpus in Standoff format.
+
+Unlike `blacklist_entities.py`, which removes blacklisted entities from a corpus in CoNLL-like (BIO)
+format, this script works directly on the `.ann` files written by `iexml_to_standoff.py`, so that
+blacklisted annotations never reach downstream conversion. Every single-token annotation whose
+text and type exactly match an entry in any of the given blacklists is removed, and the remaining
+text-bound annotations are renumbered (T1, T2, ...). Blacklists are in the format of those under
+`supplementary/entity_blacklists` (one entity and its label per line, seperated by a tab).
+
+Run the script with:
+
+```
+python blacklist_standoff.py -i path/to/standoff/corpus -b path/to/blacklist.txt
+```
+
+By default, the `.ann` files are modified in place. To write a blacklisted copy of the corpus
+instead:
+
+```
+python blacklist_standoff.py -i path/to/standoff/corpus -b path/to/blacklist.txt -o path/to/output
+```
+"""
+import argparse
+import errno
+import os
+import re
+import shutil
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+
+# matches references to text-bound annotations in other annotations (e.g. relations, attributes)
+T_ID_RE = re.compile(r'\bT\d+\b')
+
+def main(corpus_dir, blacklists, output_dir, processes):
+    """Removes all annotations in `blacklists` from the Standoff corpus at `corpus_dir`.
+
+    Args:
+        corpus_dir (str): path to a corpus in Standoff format.
+        blacklists (list): paths to one or more entity blacklists.
+        output_dir (str): path to the directory to write the blacklisted corpus to. If falsy, the
+            `.ann` files in `corpus_dir` are modified in place.
+        processes (int): number of worker processes.
+    """
+    blacklist = load_blacklist(blacklists)
+    if output_dir:
+        make_dir(output_dir)
+        # writing to the input directory is the same as modifying the corpus in place
+        if os.path.samefile(corpus_dir, output_dir):
+            output_dir = ''
+
+    ann_filepaths = [str(f) for f in Path(corpus_dir).glob('*.ann') if not f.name.startswith('._')]
+    filter_fn = partial(filter_ann, blacklist=blacklist, output_dir=output_dir)
+
+    print('[INFO] Removing blacklisted entities...', end=' ')
+    removed, changed = 0, 0
+    with Pool(processes) as pool:
+        for num_removed in pool.imap_unordered(filter_fn, ann_filepaths, chunksize=64):
+            removed += num_removed
+            changed += bool(num_removed)
+    print('Done. Removed {} entities from {} of {} file(s).'.format(removed, changed,
+                                                                    len(ann_filepaths)))
+
+def load_blacklist(filepaths):
+    """Returns the set of (text, type) pairs in the blacklists at `filepaths`.
+
+    Each blacklist is expected to contain one entity per line, where each line contains the entity
+    and its label seperated by a tab (e.g. 'gene    B-PRGE'). The 'B-' prefix of the label is
+    dropped to match the entity types used in Standoff format.
+    """
+    blacklist = set()
+    for filepath in filepaths:
+        with open(filepath, 'r') as f:
+            for line in f:
+                split_line = line.strip().split('\t')
+                if len(split_line) == 2:
+                    ent, label = split_line
+                    blacklist.add((ent, re.sub(r'^[BI]-', '', label)))
+
+    return blacklist
+
+def filter_ann(ann_filepath, blacklist, output_dir=None):
+    """Removes blacklisted annotations from the `.ann` file at `ann_filepath` in a single pass.
+
+    Single-token, text-bound annotations whose (text, type) pair is in `blacklist` are removed and
+    the remaining text-bound annotations are renumbered. Annotations which refer to a removed
+    annotation are also removed. If `output_dir` is provided, the filtered `.ann` file and its
+    corresponding `.txt` file are written there, otherwise `ann_filepath` is modified in place.
+
+    Returns:
+        the number of blacklisted annotations removed from `ann_filepath`.
+    """
+    filename = os.path.basename(ann_filepath)
+    output_filepath = os.path.join(output_dir or os.path.dirname(ann_filepath), filename)
+    tmp_filepath = output_filepath + '.tmp'
+
+    num_removed = 0
+    id_map = {}
+    with open(ann_filepath, 'r') as in_file, open(tmp_filepath, 'w') as out_file:
+        for line in in_file:
+            split_line = line.rstrip('\n').split('\t')
+            if line.startswith('T') and len(split_line) >= 3:
+                ent, ent_type = split_line[2], split_line[1].split(' ')[0]
+                if (ent, ent_type) in blacklist and len(ent.split()) == 1:
+                    id_map[split_line[0]] = None
+                    num_removed += 1
+                    continue
+                id_map[split_line[0]] = 'T{}'.format(len(id_map) - num_removed + 1)
+                out_file.write('\t'.join([id_map[split_line[0]]] + split_line[1:]) + '\n')
+            else:
+                # references only appear in the second field, later fields (e.g. the text of an
+                # AnnotatorNotes annotation) are free text and left untouched
+                if len(split_line) < 2:
+                    out_file.write(line)
+                    continue
+                refs = T_ID_RE.findall(split_line[1])
+                # drop any annotation which refers to a removed annotation
+                if any(ref in id_map and id_map[ref] is None for ref in refs):
+                    continue
+                split_line[1] = T_ID_RE.sub(lambda m: id_map.get(m.group(), m.group()), split_line[1])
+                out_file.write('\t'.join(split_line) + '\n')
+
+    os.replace(tmp_filepath, output_filepath)
+    if output_dir:
+        txt_filepath = ann_filepath[:-len('.ann')] + '.txt'
+        if os.path.isfile(txt_filepath):
+            shutil.copy(txt_filepath, output_dir)
+
+    return num_removed
+
+def make_dir(directory):
+    """Creates a directory at `directory` if it does not already exist.
+    """
+    try:
+        os.makedirs(directory)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=('Removes blacklisted entities from a given '
+                                                  'corpus in Standoff format based on one or more '
+                                                  'given entity blacklists.'))
+    parser.add_argument('-i', '--input', type=str, required=True, help=('Path to the Standoff '
+                                                                        'formatted corpus.'))
+    parser.add_argument('-b', '--blacklist', type=str, required=True, nargs='+',
+                        help='Path(s) to the entity blacklist(s).')
+    parser.add_argument('-o', '--output', type=str, required=False, default='',
+                        help=('Directory to save the blacklisted corpus to. If not provided, the '
+                              'corpus is modified in place.'))
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='Number of worker processes. Defaults to the number of CPUs.')
+    args = parser.parse_args()
+
+    main(args.input, args.blacklist, args.output, args.processes)
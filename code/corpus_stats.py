@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""Computes summary statistics for one or more corpora in Standoff or CoNLL-like (BIO) format.
+
+For each corpus, reports the number of entities per type, a histogram of entity span lengths (in
+tokens) per type and the most frequent tokens. If more than one corpus is given, also reports a
+vocabulary overlap matrix, where the entry at row i, column j is the fraction of the vocabulary of
+corpus i that also appears in corpus j (e.g. how much of each GSC is covered by the SSC).
+
+Tokens and entity types are interned to integer ids and the per-file statistics for each corpus are
+cached to disk as NumPy arrays (one `.npz` file per corpus, under `--cache`), along with the
+corpus-level summaries computed from them. On subsequent runs, only files that were added or changed
+since the last run are re-read. Pass `--no_update` to skip checking the corpus for changes and
+answer straight from the cache. Requires NumPy.
+
+Standoff corpora are recognized by their `.ann` files (the text is read from the corresponding
+`.txt` file), BIO corpora by their `.tsv` files.
+
+Run the script with:
+
+```
+python corpus_stats.py -i path/to/ssc path/to/gsc_1 path/to/gsc_2 -c path/to/cache
+```
+"""
+import argparse
+import errno
+import hashlib
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+# approximates the tokenization of the BIO corpora for the text of Standoff corpora
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+def main(corpora, cache_dir, top, min_token_length, update):
+    """Prints summary statistics for each corpus in `corpora`, updating the cache at `cache_dir`
+    unless `update` is False.
+
+    Args:
+        corpora (list): list of paths to corpora in Standoff or BIO format.
+        cache_dir (str): path to the directory where cached statistics are saved.
+        top (int): number of most frequent tokens to report for each corpus.
+        min_token_length (int): tokens shorter than this are ignored when reporting the most
+            frequent tokens and vocabulary overlap.
+        update (bool): True if the cache should be updated with any added or changed files.
+    """
+    make_dir(cache_dir)
+    tokens = Vocab(os.path.join(cache_dir, 'tokens.txt'))
+    types = Vocab(os.path.join(cache_dir, 'types.txt'))
+
+    summaries = []
+    for corpus in corpora:
+        cache_filepath = get_cache_filepath(corpus, cache_dir)
+        if update:
+            summary = update_summary(corpus, cache_filepath, tokens, types)
+        else:
+            summary = load_summary(cache_filepath)
+            if summary is None:
+                raise ValueError(('No cached statistics found for {}. Run this script without '
+                                  '--no_update first.').format(corpus))
+        summaries.append(summary)
+
+    token_mask = get_token_mask(tokens, min_token_length)
+    for corpus, summary in zip(corpora, summaries):
+        print_summary(corpus, summary, tokens, types, token_mask, top)
+    if len(corpora) > 1:
+        print_overlap(corpora, summaries, token_mask)
+
+class Vocab(object):
+    """An append-only mapping of strings to integer ids, saved to `filepath` one string per line.
+
+    Ids are never reassigned, so arrays of ids cached on disk remain valid as the vocabulary grows.
+    The length of each string is also cached, as an int32 array next to `filepath`.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.lengths_filepath = os.path.splitext(filepath)[0] + '_lengths.npy'
+        self.itos = []
+        if os.path.isfile(filepath):
+            with open(filepath, 'r', newline='') as f:
+                self.itos = f.read().split('\n')[:-1]
+        self._stoi = None
+        self.num_saved = len(self.itos)
+
+    def __len__(self):
+        return len(self.itos)
+
+    @property
+    def stoi(self):
+        # only needed to intern strings, so built lazily to keep read-only queries fast
+        if self._stoi is None:
+            self._stoi = {s: i for i, s in enumerate(self.itos)}
+        return self._stoi
+
+    def intern(self, strings):
+        """Returns an int32 array of the ids of `strings`, adding any unseen strings to the vocab.
+        """
+        stoi = self.stoi
+        ids = []
+        for s in strings:
+            if s not in stoi:
+                stoi[s] = len(self.itos)
+                self.itos.append(s)
+            ids.append(stoi[s])
+        return np.array(ids, dtype=np.int32)
+
+    def get_lengths(self):
+        """Returns an int32 array of the length of each string in the vocab.
+
+        Lengths of saved strings are read from `self.lengths_filepath`, any missing from it are
+        computed and saved.
+        """
+        lengths = np.zeros(0, dtype=np.int32)
+        if os.path.isfile(self.lengths_filepath):
+            lengths = np.load(self.lengths_filepath)
+        if lengths.size < self.num_saved:
+            lengths = np.concatenate([lengths, get_lengths(self.itos[lengths.size:self.num_saved])])
+            np.save(self.lengths_filepath, lengths)
+        return np.concatenate([lengths[:self.num_saved], get_lengths(self.itos[self.num_saved:])])
+
+    def save(self):
+        """Appends any strings added since the vocab was last saved to `self.filepath`.
+        """
+        with open(self.filepath, 'a', newline='') as f:
+            for s in self.itos[self.num_saved:]:
+                f.write('{}\n'.format(s))
+        self.num_saved = len(self.itos)
+        # update the cached lengths
+        self.get_lengths()
+
+def update_summary(corpus, cache_filepath, tokens, types):
+    """Updates the cached statistics for `corpus` at `cache_filepath` and returns its summary.
+
+    Statistics for files which have not changed since they were last cached are reused, all other
+    files are re-read.
+    """
+    cached = load_columns(cache_filepath)
+    cached_idx = {} if cached is None else {f: i for i, f in enumerate(cached['files'])}
+
+    files, mtimes, sizes = [], [], []
+    token_ids, token_counts, entity_types, entity_lengths = [], [], [], []
+    num_changed = 0
+    for filepath, fmt, mtime, size in get_file_stats(corpus):
+        relpath = os.path.relpath(filepath, corpus)
+        i = cached_idx.get(relpath)
+        if i is not None and cached['mtimes'][i] == mtime and cached['sizes'][i] == size:
+            t_start, t_end = cached['token_offsets'][i:i + 2]
+            e_start, e_end = cached['entity_offsets'][i:i + 2]
+            ids, counts = cached['token_ids'][t_start:t_end], cached['token_counts'][t_start:t_end]
+            ent_types = cached['entity_types'][e_start:e_end]
+            ent_lengths = cached['entity_lengths'][e_start:e_end]
+        else:
+            file_tokens, file_entities = parse_standoff(filepath) if fmt == 'standoff' else parse_bio(filepath)
+            ids, counts = np.unique(tokens.intern(file_tokens), return_counts=True)
+            ent_types = types.intern([ent[0] for ent in file_entities])
+            ent_lengths = np.array([ent[1] for ent in file_entities], dtype=np.int32)
+            num_changed += 1
+
+        files.append(relpath)
+        mtimes.append(mtime)
+        sizes.append(size)
+        token_ids.append(ids.astype(np.int32))
+        token_counts.append(counts.astype(np.int32))
+        entity_types.append(ent_types.astype(np.int32))
+        entity_lengths.append(ent_lengths.astype(np.int32))
+
+    num_removed = len(cached_idx.keys() - set(files))
+    print('[INFO] {}: {} file(s), {} added or changed, {} removed.'.format(
+        corpus, len(files), num_changed, num_removed))
+
+    columns = {
+        'files': np.array(files, dtype=str),
+        'mtimes': np.array(mtimes, dtype=np.int64),
+        'sizes': np.array(sizes, dtype=np.int64),
+        'token_offsets': get_offsets(token_ids),
+        'token_ids': concatenate(token_ids),
+        'token_counts': concatenate(token_counts),
+        'entity_offsets': get_offsets(entity_types),
+        'entity_types': concatenate(entity_types),
+        'entity_lengths': concatenate(entity_lengths),
+    }
+    summary = get_summary(columns, len(tokens), len(types))
+
+    if num_changed or num_removed or cached is None:
+        # save the vocabs first, so the cache never refers to ids that are not on disk
+        tokens.save()
+        types.save()
+        np.savez(cache_filepath, **columns, **summary)
+
+    return summary
+
+def get_summary(columns, num_tokens, num_types):
+    """Returns the corpus-level summary of the per-file statistics in `columns`.
+    """
+    lengths = columns['entity_lengths']
+    max_length = int(lengths.max()) if lengths.size else 0
+    length_hist = np.zeros((num_types, max_length + 1), dtype=np.int64)
+    np.add.at(length_hist, (columns['entity_types'], lengths), 1)
+
+    return {
+        'num_files': np.array(len(columns['files'])),
+        'token_freq': np.bincount(columns['token_ids'], weights=columns['token_counts'],
+                                  minlength=num_tokens).astype(np.int64),
+        'entity_counts': np.bincount(columns['entity_types'], minlength=num_types).astype(np.int64),
+        'length_hist': length_hist,
+    }
+
+def load_columns(cache_filepath):
+    """Returns a dictionary of all arrays cached at `cache_filepath`, or None if there is no cache.
+    """
+    if not os.path.isfile(cache_filepath):
+        return None
+    with np.load(cache_filepath) as cached:
+        return {key: cached[key] for key in cached.files}
+
+def load_summary(cache_filepath):
+    """Returns the corpus-level summary cached at `cache_filepath`, or None if there is no cache.
+
+    Only the summary arrays are read, the (much larger) per-file arrays are left on disk.
+    """
+    if not os.path.isfile(cache_filepath):
+        return None
+    with np.load(cache_filepath) as cached:
+        return {key: cached[key] for key in ('num_files', 'token_freq', 'entity_counts', 'length_hist')}
+
+def get_file_stats(corpus):
+    """Yields a tuple of filepath, format, modification time and size for each file in `corpus`.
+
+    For Standoff corpora, the modification time and size account for both the `.ann` file and its
+    corresponding `.txt` file. `.ann` files without a corresponding `.txt` file are skipped.
+    """
+    for filepath in sorted(Path(corpus).glob('**/*')):
+        if not filepath.is_file() or filepath.name.startswith('._'):
+            continue
+        if filepath.suffix == '.ann':
+            txt_filepath = filepath.with_suffix('.txt')
+            if not txt_filepath.is_file():
+                continue
+            ann_stat, txt_stat = filepath.stat(), txt_filepath.stat()
+            yield (str(filepath), 'standoff', max(ann_stat.st_mtime_ns, txt_stat.st_mtime_ns),
+                   ann_stat.st_size + txt_stat.st_size)
+        elif filepath.suffix == '.tsv':
+            stat = filepath.stat()
+            yield str(filepath), 'bio', stat.st_mtime_ns, stat.st_size
+
+def parse_standoff(ann_filepath):
+    """Returns the tokens and a list of (entity type, span length) tuples for the Standoff
+    annotated document at `ann_filepath`.
+    """
+    with open(str(Path(ann_filepath).with_suffix('.txt')), 'r') as f:
+        tokens = TOKEN_RE.findall(f.read())
+
+    entities = []
+    with open(ann_filepath, 'r') as f:
+        for line in f:
+            # only text-bound annotations (T) have an entity type and span
+            if not line.startswith('T'):
+                continue
+            split_line = line.rstrip('\n').split('\t')
+            if len(split_line) < 3:
+                continue
+            entities.append((split_line[1].split(' ')[0], len(TOKEN_RE.findall(split_line[2]))))
+
+    return tokens, entities
+
+def parse_bio(filepath):
+    """Returns the tokens and a list of (entity type, span length) tuples for the CoNLL formatted
+    corpus at `filepath`.
+    """
+    tokens, entities = [], []
+    current = None
+    with open(filepath, 'r') as f:
+        for line in f:
+            ent = line.split('\t')[0].strip()
+            tag = line.split('\t')[-1].strip()
+            # sentence boundaries close any open entity
+            if ent == '' or tag == '':
+                current = None
+                continue
+            tokens.append(ent)
+            if tag.startswith('I-') and tag[2:] == current:
+                entities[-1][1] += 1
+            elif tag.startswith('B-') or tag.startswith('I-'):
+                current = tag[2:]
+                entities.append([current, 1])
+            else:
+                current = None
+
+    return tokens, [tuple(ent) for ent in entities]
+
+def get_token_mask(tokens, min_token_length):
+    """Returns a boolean array which is True for the ids of all tokens in `tokens` that are at least
+    `min_token_length` characters long.
+    """
+    if min_token_length <= 1:
+        return np.ones(len(tokens), dtype=bool)
+    return tokens.get_lengths() >= min_token_length
+
+def get_lengths(strings):
+    """Returns an int32 array of the length of each string in `strings`.
+    """
+    return np.fromiter((len(s) for s in strings), dtype=np.int32, count=len(strings))
+
+def pad(array, length):
+    """Returns 1D `array` zero-padded on the right to `length`.
+    """
+    return np.pad(array, (0, length - array.size))
+
+def print_summary(corpus, summary, tokens, types, token_mask, top):
+    """Prints the entity counts, span length histograms and most frequent tokens in `summary`.
+    """
+    token_freq = pad(summary['token_freq'], len(tokens)) * token_mask
+    print('\n{} ({} file(s), {} token(s), {} unique)'.format(
+        corpus, int(summary['num_files']), int(summary['token_freq'].sum()),
+        int(np.count_nonzero(token_freq))))
+
+    print('Entities (type, count, span length: count):')
+    for type_id in np.flatnonzero(summary['entity_counts']):
+        hist = summary['length_hist'][type_id]
+        lengths = ' '.join('{}:{}'.format(length, hist[length]) for length in np.flatnonzero(hist))
+        print('  {}\t{}\t{}'.format(types.itos[type_id], summary['entity_counts'][type_id], lengths))
+
+    print('Top {} tokens (token, count):'.format(top))
+    top_ids = np.argpartition(-token_freq, min(top, token_freq.size - 1))[:top] if token_freq.size else []
+    for token_id in sorted(top_ids, key=lambda i: -token_freq[i]):
+        if token_freq[token_id]:
+            print('  {}\t{}'.format(tokens.itos[token_id], token_freq[token_id]))
+
+def print_overlap(corpora, summaries, token_mask):
+    """Prints the vocabulary overlap matrix for `corpora`.
+
+    The entry at row i, column j is the fraction of the vocabulary of corpus i that also appears in
+    corpus j.
+    """
+    presence = np.stack([pad(summary['token_freq'], token_mask.size) > 0 for summary in summaries])
+    presence = (presence & token_mask).astype(np.int32)
+    intersection = presence @ presence.T
+    overlap = intersection / np.maximum(np.diag(intersection), 1)[:, None]
+
+    names = [os.path.basename(os.path.normpath(corpus)) for corpus in corpora]
+    print('\nVocabulary overlap (fraction of row vocabulary found in column):')
+    print('\t'.join([''] + names))
+    for name, row in zip(names, overlap):
+        print('\t'.join([name] + ['{:.3f}'.format(x) for x in row]))
+
+def get_offsets(arrays):
+    """Returns the offsets of each array in `arrays` when concatenated, including the end offset.
+    """
+    return np.concatenate([[0], np.cumsum([a.size for a in arrays], dtype=np.int64)]).astype(np.int64)
+
+def concatenate(arrays):
+    """Concatenates the int32 arrays in `arrays`, returning an empty array if there are none.
+    """
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32)
+
+def get_cache_filepath(corpus, cache_dir):
+    """Returns the filepath of the cached statistics for `corpus` under `cache_dir`.
+    """
+    corpus = os.path.abspath(corpus)
+    digest = hashlib.md5(corpus.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, '{}_{}.npz'.format(os.path.basename(corpus), digest))
+
+def make_dir(directory):
+    """Creates a directory at `directory` if it does not already exist.
+    """
+    try:
+        os.makedirs(directory)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=('Computes summary statistics for one or more '
+                                                  'corpora in Standoff or BIO format. Statistics '
+                                                  'are cached, and only files that were added or '
+                                                  'changed since the last run are re-read.'))
+    parser.add_argument('--input', '-i', required=True, nargs='+', type=str,
+                        help='Path(s) to the corpora, e.g. the SSC followed by each of the GSCs.')
+    parser.add_argument('--cache', '-c', default='.corpus_stats', type=str,
+                        help='Path to the cache directory. Defaults to ./.corpus_stats')
+    parser.add_argument('--top', '-t', default=20, type=int,
+                        help='Number of most frequent tokens to report. Defaults to 20.')
+    parser.add_argument('--min_token_length', '-m', default=1, type=int,
+                        help=('Ignore tokens shorter than this when reporting frequent tokens and '
+                              'vocabulary overlap. Defaults to 1.'))
+    parser.add_argument('--no_update', '-n', default=False, action='store_true',
+                        help=('Pass this flag to skip checking the corpora for changes and answer '
+                              'from the cache only.'))
+    args = parser.parse_args()
+
+    main(args.input, args.cache, args.top, args.min_token_length, not args.no_update)
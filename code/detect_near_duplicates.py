@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""Generates a blacklist of PMIDs for documents in a SSC which are near-duplicates of documents in a
+collection of GSCs.
+
+The PMID blacklists under `supplementary/pmid_blacklists` only catch documents which share a PMID
+with a document in one of the GSCs. This script catches re-issued or lightly edited abstracts which
+appear under a different PMID. Every document is reduced to a MinHash signature over its word
+shingles, the signatures of the GSC documents are indexed with locality-sensitive hashing (LSH), and
+each SSC document is queried against this index. Any SSC document whose estimated Jaccard
+similarity with a GSC document is at least `--threshold` is blacklisted. Assumes all corpora are in
+Standoff format.
+
+Run the script with:
+
+```
+python detect_near_duplicates.py -g path/to/gscs -s path/to/ssc -o path/to/output
+```
+
+The resulting blacklist (`near_duplicate_pmids_blacklist.txt`) contains one PMID per line and can
+be passed directly to `blacklist_pmids.py`:
+
+```
+python blacklist_pmids.py -i path/to/ssc -b path/to/output/near_duplicate_pmids_blacklist.txt
+```
+"""
+import argparse
+import errno
+import os
+import random
+import re
+import time
+import zlib
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+
+# a Mersenne prime larger than any 32-bit shingle hash, used for the universal hash functions
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+def main(gsc, ssc, output_dir, threshold, num_perm, shingle_size, processes, seed, exclude):
+    """Writes a blacklist of PMIDs for documents in `ssc` that are near-duplicates of documents in
+    `gsc`.
+
+    Args:
+        gsc (str): path to top-level directory which houses the GSCs, in Standoff format.
+        ssc (str): path to the SSC, in Standoff format.
+        output_dir (str): path to the directory to save the blacklist to.
+        threshold (float): minimum estimated Jaccard similarity for two documents to be considered
+            near-duplicates.
+        num_perm (int): number of permutations (i.e., length) of each MinHash signature.
+        shingle_size (int): number of words in each shingle.
+        processes (int): number of worker processes used to compute signatures.
+        seed (int): random seed used to generate the permutations.
+        exclude (str): optional path to an existing PMID blacklist. PMIDs in this blacklist are
+            left out of the generated blacklist.
+    """
+    permutations = get_permutations(num_perm, seed)
+    bands, rows = get_optimal_params(threshold, num_perm)
+    signature_fn = partial(get_signature, permutations=permutations, shingle_size=shingle_size)
+
+    with Pool(processes) as pool:
+        print('[INFO] Building the LSH index for the GSCs...', end=' ')
+        start = time.time()
+        gsc_filepaths = get_filepaths(gsc)
+        index = LSHIndex(bands, rows)
+        # key GSC documents on their filepath, as the same PMID may appear in more than one GSC
+        for filepath, signature in pool.imap_unordered(signature_fn, gsc_filepaths, chunksize=64):
+            if signature is not None:
+                index.insert(filepath, signature)
+        print('Done. {}'.format(get_throughput(len(gsc_filepaths), time.time() - start)))
+
+        print('[INFO] Querying the LSH index with the SSC...', end=' ')
+        start = time.time()
+        ssc_filepaths = get_filepaths(ssc)
+        blacklist = set()
+        for filepath, signature in pool.imap_unordered(signature_fn, ssc_filepaths, chunksize=64):
+            if signature is not None and index.query(signature, threshold):
+                blacklist.add(Path(filepath).stem)
+        print('Done. {}'.format(get_throughput(len(ssc_filepaths), time.time() - start)))
+
+    if exclude:
+        with open(exclude, 'r') as f:
+            blacklist -= {line.strip() for line in f}
+
+    print('[INFO] Found {} near-duplicate document(s) in the SSC.'.format(len(blacklist)))
+    make_dir(output_dir)
+    save_blacklist(blacklist, output_dir)
+
+class LSHIndex(object):
+    """A locality-sensitive hashing index over MinHash signatures.
+
+    Each signature is split into `bands` bands of `rows` rows. Two signatures are candidate
+    near-duplicates if they agree on every row of at least one band.
+
+    Args:
+        bands (int): number of bands to split each signature into.
+        rows (int): number of rows in each band.
+    """
+    def __init__(self, bands, rows):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def insert(self, key, signature):
+        """Inserts `signature` into the index under `key`.
+        """
+        self.signatures[key] = signature
+        for band, bucket in zip(self.get_bands(signature), self.buckets):
+            bucket.setdefault(band, []).append(key)
+
+    def query(self, signature, threshold):
+        """Returns the keys of all indexed signatures with an estimated Jaccard similarity to
+        `signature` of at least `threshold`.
+        """
+        candidates = set()
+        for band, bucket in zip(self.get_bands(signature), self.buckets):
+            candidates.update(bucket.get(band, []))
+
+        return [key for key in candidates
+                if get_jaccard(signature, self.signatures[key]) >= threshold]
+
+    def get_bands(self, signature):
+        """Returns `signature` split into a list of `self.bands` hashable bands.
+        """
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+def get_permutations(num_perm, seed):
+    """Returns a list of `num_perm` (a, b) pairs, each of which parameterizes a universal hash
+    function h(x) = (a * x + b) mod p used to simulate a random permutation.
+    """
+    rng = random.Random(seed)
+    return [(rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)]
+
+def get_optimal_params(threshold, num_perm):
+    """Returns the number of bands and rows that minimize the (equally weighted) probability of false
+    positives and false negatives for a given `threshold` and `num_perm`.
+    """
+    def probability(s, bands, rows):
+        return 1 - (1 - s ** rows) ** bands
+
+    def integrate(f, a, b, steps=100):
+        # trapezoidal rule
+        step = (b - a) / steps
+        return step * (sum(f(a + i * step) for i in range(1, steps)) + (f(a) + f(b)) / 2)
+
+    min_error, best = float('inf'), (num_perm, 1)
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_pos = integrate(lambda s: probability(s, bands, rows), 0.0, threshold)
+            false_neg = integrate(lambda s: 1 - probability(s, bands, rows), threshold, 1.0)
+            if false_pos + false_neg < min_error:
+                min_error, best = false_pos + false_neg, (bands, rows)
+
+    return best
+
+def get_shingles(text, shingle_size):
+    """Returns the set of hashed, lowercased word shingles of length `shingle_size` in `text`, which
+    is empty if `text` contains no tokens.
+    """
+    tokens = re.findall(r'\w+', text.lower())
+    # documents shorter than a single shingle are represented by all of their tokens
+    if len(tokens) < shingle_size:
+        return {zlib.crc32(' '.join(tokens).encode('utf-8'))} if tokens else set()
+
+    # crc32 (unlike hash()) is stable across worker processes
+    return {zlib.crc32(' '.join(tokens[i:i + shingle_size]).encode('utf-8'))
+            for i in range(len(tokens) - shingle_size + 1)}
+
+def get_signature(filepath, permutations, shingle_size):
+    """Returns a tuple of `filepath` and the MinHash signature of the Standoff `.txt` at `filepath`,
+    or None in place of the signature if the document contains no tokens.
+    """
+    with open(filepath, 'r') as f:
+        shingles = get_shingles(f.read(), shingle_size)
+    # documents without any tokens have no meaningful signature
+    if not shingles:
+        return filepath, None
+    signature = [min(((a * x + b) % MERSENNE_PRIME) & MAX_HASH for x in shingles)
+                 for a, b in permutations]
+
+    return filepath, signature
+
+def get_jaccard(signature_a, signature_b):
+    """Returns the Jaccard similarity estimated from the MinHash signatures `signature_a` and
+    `signature_b`.
+    """
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / len(signature_a)
+
+def get_throughput(num_docs, seconds):
+    """Returns a human readable string summarizing the throughput of processing `num_docs` documents
+    in `seconds`.
+    """
+    return 'Processed {} document(s) in {:.2f}s ({:.1f} docs/s).'.format(
+        num_docs, seconds, num_docs / seconds if seconds > 0 else float('inf'))
+
+def get_filepaths(directory, suffix='.txt'):
+    """Returns a list of filepaths under `directory`, and all of its subdirectories, with extension
+    `suffix`. Hidden files (those beginning with '._') are ignored.
+    """
+    return [str(f) for f in Path(directory).glob('**/*{}'.format(suffix))
+            if f.is_file() and not f.name.startswith('._')]
+
+def save_blacklist(blacklist, output_dir):
+    """Writes `blacklist` to `output_dir`, with each PMID written to its own line.
+    """
+    output_filepath = os.path.join(output_dir, 'near_duplicate_pmids_blacklist.txt')
+    print('[INFO] Writing blacklist to {}...'.format(output_filepath))
+    with open(output_filepath, 'w') as f:
+        for pmid in sorted(blacklist):
+            f.write('{}\n'.format(pmid))
+
+def make_dir(directory):
+    """Creates a directory at `directory` if it does not already exist.
+    """
+    try:
+        os.makedirs(directory)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=('Generate a blacklist of PMIDs for documents in a '
+                                                  'SSC which are near-duplicates of documents in '
+                                                  'one or more GSCs. All corpora are expected to '
+                                                  'be in Standoff format. The blacklist is saved to '
+                                                  'the filepath at --output, which defaults to the '
+                                                  'directory the script was called from.'))
+    parser.add_argument('--gsc', '-g', required=True, type=str,
+                        help='Path to top-level directory which houses GSCs.')
+    parser.add_argument('--ssc', '-s', required=True, type=str,
+                        help='Path to SSC directory.')
+    parser.add_argument('--output', '-o', default='.', type=str,
+                        help="Path to output directory. Defaults to directory script was called from")
+    parser.add_argument('--threshold', '-t', default=0.8, type=float,
+                        help=('Minimum estimated Jaccard similarity for two documents to be '
+                              'considered near-duplicates. Defaults to 0.8.'))
+    parser.add_argument('--num_perm', default=128, type=int,
+                        help='Number of permutations used for each MinHash signature. Defaults to 128.')
+    parser.add_argument('--shingle_size', default=3, type=int,
+                        help='Number of words in each shingle. Defaults to 3.')
+    parser.add_argument('--processes', '-p', default=None, type=int,
+                        help='Number of worker processes. Defaults to the number of CPUs.')
+    parser.add_argument('--seed', default=42, type=int,
+                        help='Random seed used to generate the MinHash permutations.')
+    parser.add_argument('--exclude', '-e', required=False, default='',
+                        help=('Path to an existing PMID blacklist (e.g. all_pmids_blacklist.txt). '
+                              'PMIDs in this blacklist are left out of the generated blacklist.'))
+    args = parser.parse_args()
+
+    main(args.gsc, args.ssc, args.output, args.threshold, args.num_perm, args.shingle_size,
+         args.processes, args.seed, args.exclude)